@@ -15,6 +15,11 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import os
+import threading
+
+from collections import OrderedDict
+
 from gi.repository import GObject
 
 from . import logger
@@ -72,4 +77,68 @@ class cached(object):
         return value
 
 
+class PortfolioListings(GObject.GObject):
+    __gtype_name__ = "PortfolioListings"
+
+    MAX_ENTRIES = 100000
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._listings = OrderedDict()
+        self._entries = 0
+        self._max_entries = self.MAX_ENTRIES
+
+    def _evict(self):
+        while self._entries > self._max_entries:
+            directory, (stamp, rows) = self._listings.popitem(last=False)
+            self._entries -= len(rows)
+            logger.debug(f"listing evicted {directory}")
+
+    def _remove(self, directory):
+        if directory not in self._listings:
+            return
+
+        stamp, rows = self._listings.pop(directory)
+        self._entries -= len(rows)
+
+    def get_stamp(self, directory):
+        stat = os.stat(directory)
+        return (stat.st_dev, stat.st_ino, stat.st_mtime_ns)
+
+    def retrieve(self, directory, stamp):
+        with self._lock:
+            if directory not in self._listings:
+                return None
+
+            # the directory changed since it was listed
+            if self._listings[directory][0] != stamp:
+                self._remove(directory)
+                return None
+
+            self._listings.move_to_end(directory)
+            return self._listings[directory][1]
+
+    def store(self, directory, stamp, rows):
+        with self._lock:
+            self._remove(directory)
+
+            if len(rows) > self._max_entries:
+                return
+
+            self._listings[directory] = (stamp, rows)
+            self._entries += len(rows)
+            self._evict()
+
+    def invalidate(self, directory):
+        with self._lock:
+            self._remove(directory)
+
+    def resize(self, max_entries):
+        with self._lock:
+            self._max_entries = max_entries
+            self._evict()
+
+
 default_cache = PortfolioCache()
+default_listings = PortfolioListings()
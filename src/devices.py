@@ -15,6 +15,8 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import os
+
 from gi.repository import Gio, GLib, GObject
 
 from . import logger
@@ -475,6 +477,21 @@ class PortfolioDevices(GObject.GObject):
         elif encrypted := object.get_interface("org.freedesktop.UDisks2.Encrypted"):
             self._remove_encrypted(encrypted.get_object_path())
 
+    def has_device(self, path):
+        for _, device in self._devices.items():
+            if device.mount_point is None or device.drive_object is None:
+                continue
+
+            block = device.encrypted_object or device
+            if block.hint_system is not False:
+                continue
+
+            mount_point = os.path.join(device.mount_point, "")
+            if os.path.join(path, "").startswith(mount_point):
+                return True
+
+        return False
+
     def scan(self):
         if self._manager is None:
             return
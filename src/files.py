@@ -19,14 +19,30 @@ import os
 
 from pathlib import Path
 
-from gi.repository import Gtk, GLib, GObject
+from gi.repository import Gdk, Gio, Gtk, GLib, GObject, Pango
 
 from . import utils
 from . import logger
+from .icons import default_icons
 from .settings import PortfolioSettings
 from .translation import gettext as _
 
 
+class PortfolioFile(GObject.Object):
+    __gtype_name__ = "PortfolioFile"
+
+    icon = GObject.Property(type=Gio.Icon)
+    name = GObject.Property(type=str)
+    name_key = GObject.Property(type=str)
+    time_key = GObject.Property(type=GObject.TYPE_INT64)
+    hidden = GObject.Property(type=bool, default=False)
+
+    def __init__(self, path, info, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.info = info
+
+
 @Gtk.Template(resource_path="/dev/tchx84/Portfolio/files.ui")
 class PortfolioFiles(Gtk.ScrolledWindow):
     __gtype_name__ = "PortfolioFiles"
@@ -41,17 +57,23 @@ class PortfolioFiles(Gtk.ScrolledWindow):
         "adjustment-changed": (GObject.SignalFlags.RUN_LAST, None, (bool,)),
     }
 
-    treeview = Gtk.Template.Child()
+    view = Gtk.Template.Child()
+    row_factory = Gtk.Template.Child()
+    icon_factory = Gtk.Template.Child()
+    name_factory = Gtk.Template.Child()
     name_column = Gtk.Template.Child()
-    name_cell = Gtk.Template.Child()
+    selection = Gtk.Template.Child()
     sorted = Gtk.Template.Child()
+    name_sorter = Gtk.Template.Child()
+    time_sorter = Gtk.Template.Child()
     filtered = Gtk.Template.Child()
-    selection = Gtk.Template.Child()
+    filters = Gtk.Template.Child()
+    name_filter = Gtk.Template.Child()
+    hidden_filter = Gtk.Template.Child()
     liststore = Gtk.Template.Child()
 
-    ICON_COLUMN = 0
-    NAME_COLUMN = 1
-    PATH_COLUMN = 2
+    LAZY_PREFETCH = 50
+    LAZY_BUFFER = 25
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -59,37 +81,51 @@ class PortfolioFiles(Gtk.ScrolledWindow):
 
     def _setup(self):
         self._is_editing = False
+        self._renaming = None
+        self._selecting = False
         self._to_select_path = None
         self._to_select_row = None
         self._to_go_to_path = None
         self._to_go_to_row = None
-        self._last_clicked = None
         self._dont_activate = False
-        self._force_select = False
         self._last_vscroll_value = None
+        self._last_lazy_value = 0
+        self._lazy = set()
+        self._lazy_queue = None
+        self._lazy_handler_id = 0
+        self._bound = []
+        self._detached = False
+        self._rows = {}
+        self._cells = {}
+        self._lazy_forward = True
         self._filter = ""
+        self._show_hidden = False
         self._sort_order = PortfolioSettings.ALPHABETICAL_ORDER
 
-        self.filtered.set_visible_func(self._filter_func, None)
-        self.sorted.set_default_sort_func(self._sort_func, None)
-        self.selection.connect("changed", self._on_selection_changed)
-        self.selection.set_select_function(self._on_select)
-        self.treeview.connect("row-activated", self._on_row_activated)
+        self.filters.append(self.name_filter)
+        self.filters.append(self.hidden_filter)
+        self._update_sort_column()
 
-        self.name_cell.connect("editing-started", self._on_rename_started)
-        self.name_cell.connect("edited", self._on_rename_updated)
-        self.name_cell.connect("editing-canceled", self._on_rename_finished)
+        # there is nothing to sort by from the headers
+        child = self.view.get_first_child()
+        while child is not None:
+            if child.get_css_name() == "header":
+                child.set_visible(False)
+            child = child.get_next_sibling()
 
-        self._adjustment = self.get_vadjustment()
-        self._adjustment.connect("value-changed", self._on_adjustment_changed)
+        self.row_factory.connect("setup", self._on_row_setup)
+        self.icon_factory.connect("setup", self._on_icon_setup)
+        self.icon_factory.connect("bind", self._on_icon_bind)
+        self.icon_factory.connect("unbind", self._on_icon_unbind)
+        self.name_factory.connect("setup", self._on_name_setup)
+        self.name_factory.connect("bind", self._on_name_bind)
+        self.name_factory.connect("unbind", self._on_name_unbind)
 
-        self.clicks = Gtk.GestureClick.new()
-        self.clicks.connect("pressed", self._on_clicked)
-        self.treeview.add_controller(self.clicks)
+        self.selection.connect("selection-changed", self._on_selection_changed)
+        self.view.connect("activate", self._on_row_activated)
 
-        self.gestures = Gtk.GestureLongPress.new()
-        self.gestures.connect("pressed", self._on_long_pressed)
-        self.treeview.add_controller(self.gestures)
+        self._adjustment = self.get_vadjustment()
+        self._adjustment.connect("value-changed", self._on_adjustment_changed)
 
     @property
     def filter(self):
@@ -98,7 +134,24 @@ class PortfolioFiles(Gtk.ScrolledWindow):
     @filter.setter
     def filter(self, value):
         self._filter = value
-        self.filtered.refilter()
+        self.name_filter.set_search(value)
+
+    @property
+    def show_hidden(self):
+        return self._show_hidden
+
+    @show_hidden.setter
+    def show_hidden(self, value):
+        if value == self._show_hidden:
+            return
+
+        self._show_hidden = value
+
+        # the hidden filter is always the last one
+        if value:
+            self.filters.remove(self.filters.get_n_items() - 1)
+        else:
+            self.filters.append(self.hidden_filter)
 
     @property
     def to_select_path(self):
@@ -123,10 +176,11 @@ class PortfolioFiles(Gtk.ScrolledWindow):
     @sort_order.setter
     def sort_order(self, value):
         self._sort_order = value
+        self._update_sort_column()
 
     @property
     def selected_count(self):
-        return self.selection.count_selected_rows()
+        return self.selection.get_selection().get_size()
 
     @property
     def is_editing(self):
@@ -136,77 +190,97 @@ class PortfolioFiles(Gtk.ScrolledWindow):
     def is_empty(self):
         return len(self.sorted) == 0
 
-    def _filter_func(self, model, row, data=None):
-        path = model[row][self.PATH_COLUMN]
-        if not self._filter:
-            return True
-        return self._filter.lower() in os.path.basename(path).lower()
-
-    def _sort_func(self, model, row1, row2, data=None):
-        path1 = model[row1][self.PATH_COLUMN]
-        path2 = model[row2][self.PATH_COLUMN]
-
-        row1_is_dir = utils.is_file_dir(path1)
-        row2_is_dir = utils.is_file_dir(path2)
+    def _get_sort_keys(self, name, info):
+        # directories always go first
+        is_file = 0 if info.is_dir else 1
+
+        # compared byte by byte, so the order is the same in every locale
+        name_key = f"{is_file}{name.casefold()}"
+        time_key = (is_file << 62) - int(info.mtime * 1000000)
+
+        return name_key, time_key
+
+    def _new_row(self, icon, name, path, info):
+        name_key, time_key = self._get_sort_keys(name, info)
+        return PortfolioFile(
+            path,
+            info,
+            icon=icon,
+            name=name,
+            name_key=name_key,
+            time_key=time_key,
+            hidden=name.startswith("."),
+        )
 
-        if row1_is_dir and not row2_is_dir:
-            return -1
-        elif not row1_is_dir and row2_is_dir:
-            return 1
+    def _update_row(self, row, icon, name, path, info):
+        name_key, time_key = self._get_sort_keys(name, info)
+
+        row.path = path
+        row.info = info
+        row.icon = icon
+        row.name = name
+        row.name_key = name_key
+        row.time_key = time_key
+        row.hidden = name.startswith(".")
+
+        # sorting and filtering only look again at rows that changed
+        found, position = self.liststore.find(row)
+        if found:
+            self.liststore.items_changed(position, 1, 1)
+
+    def _remove_row(self, row):
+        self._rows.pop(row.path, None)
+        self._lazy.discard(row.path)
+
+        found, position = self.liststore.find(row)
+        if found:
+            self.liststore.remove(position)
+
+    def _update_sort_column(self):
+        # sorting happens once the model is attached again
+        if self._detached:
+            return
 
         if self._sort_order == PortfolioSettings.ALPHABETICAL_ORDER:
-            return self._sort_by_a_to_z(path1, path2)
+            sorter = self.name_sorter
         else:
-            return self._sort_by_last_modified(path1, path2)
+            sorter = self.time_sorter
 
-    def _sort_by_last_modified(self, path1, path2):
-        st_mtime1 = utils.get_file_mtime(path1)
-        st_mtime2 = utils.get_file_mtime(path2)
+        self.sorted.set_sorter(sorter)
 
-        if st_mtime1 < st_mtime2:
-            return 1
-        elif st_mtime1 > st_mtime2:
-            return -1
+    def _get_position(self, row):
+        for position, _row in enumerate(self.sorted):
+            if _row is row:
+                return position
+        return None
 
-        return 0
-
-    def _sort_by_a_to_z(self, path1, path2):
-        path1 = path1.lower()
-        path2 = path2.lower()
-
-        if path1 < path2:
-            return -1
-        elif path1 > path2:
-            return 1
-
-        return 0
-
-    def _get_path(self, model, treepath):
-        return model[model.get_iter(treepath)][self.PATH_COLUMN]
+    def _get_selected_rows(self):
+        selected = self.selection.get_selection()
+        return [
+            self.sorted.get_item(selected.get_nth(index))
+            for index in range(selected.get_size())
+        ]
 
     def _go_to_selection(self):
-        model, treepaths = self.selection.get_selected_rows()
-        treepath = treepaths[-1]
-        self.treeview.set_cursor_on_cell(
-            treepath, self.name_column, self.name_cell, False
+        selected = self.selection.get_selection()
+        if selected.is_empty():
+            return
+
+        self.view.scroll_to(
+            selected.get_maximum(), None, Gtk.ListScrollFlags.FOCUS, None
         )
-        self.treeview.scroll_to_cell(treepath, None, False, 0, 0)
 
     def _go_to(self, row):
-        result, row = self.filtered.convert_child_iter_to_iter(row)
-        result, row = self.sorted.convert_child_iter_to_iter(row)
+        position = self._get_position(row)
 
-        treepath = self.sorted.get_path(row)
+        if position is not None:
+            self.view.scroll_to(position, None, Gtk.ListScrollFlags.NONE, None)
 
-        self.treeview.scroll_to_cell(treepath, None, False, 0, 0)
         self._clear_to_go_to()
 
     def _select_and_go(self, row, edit=False):
         self.switch_to_selection_mode()
 
-        result, row = self.filtered.convert_child_iter_to_iter(row)
-        result, row = self.sorted.convert_child_iter_to_iter(row)
-
         self._select_row(row)
         GLib.idle_add(self._go_to_selection)
 
@@ -234,51 +308,134 @@ class PortfolioFiles(Gtk.ScrolledWindow):
         self._to_go_to_path = None
         self._to_go_to_row = None
 
-    def _on_selection_changed(self, selection):
-        self._update_mode()
-        self.emit("selected")
+    def _on_row_setup(self, factory, row):
+        # clicks only ever activate, selecting is handled here
+        row.set_selectable(False)
+
+    def _on_icon_setup(self, factory, cell):
+        image = Gtk.Image()
+        image.set_icon_size(Gtk.IconSize.LARGE)
+        image.set_size_request(45, 50)
+        self._add_long_press(image, cell)
+        cell.set_child(image)
+
+    def _on_icon_bind(self, factory, cell):
+        row = cell.get_item()
+        image = cell.get_child()
+        image.binding = row.bind_property(
+            "icon", image, "gicon", GObject.BindingFlags.SYNC_CREATE
+        )
 
-    def _on_select(self, selection, model, treepath, selected, data=None):
-        should_select = False
+        # rows without an icon are resolved once they get near the viewport
+        if row.path in self._lazy:
+            self._bound.append(cell.get_position())
+            self._schedule_lazy()
+
+    def _on_icon_unbind(self, factory, cell):
+        cell.get_child().binding.unbind()
+
+    def _on_name_setup(self, factory, cell):
+        label = Gtk.Label(xalign=0, ellipsize=Pango.EllipsizeMode.END)
+        entry = Gtk.Entry()
+        entry.connect("activate", self._on_rename_activated)
+
+        keys = Gtk.EventControllerKey.new()
+        keys.connect("key-pressed", self._on_rename_key_pressed)
+        entry.add_controller(keys)
+
+        focus = Gtk.EventControllerFocus.new()
+        focus.connect("leave", self._on_rename_left)
+        entry.add_controller(focus)
+
+        stack = Gtk.Stack()
+        stack.add_named(label, "label")
+        stack.add_named(entry, "entry")
+        stack.label = label
+        stack.entry = entry
+
+        self._add_long_press(stack, cell)
+        cell.set_child(stack)
+
+    def _on_name_bind(self, factory, cell):
+        row = cell.get_item()
+        stack = cell.get_child()
+        stack.binding = row.bind_property(
+            "name", stack.label, "label", GObject.BindingFlags.SYNC_CREATE
+        )
+        self._cells[row] = stack
+
+    def _on_name_unbind(self, factory, cell):
+        row = cell.get_item()
+        cell.get_child().binding.unbind()
 
-        if self._force_select is True:
-            should_select = True
-        elif treepath != self._last_clicked and selected:
-            should_select = False
-        elif treepath != self._last_clicked and not selected:
-            should_select = False
-        elif treepath == self._last_clicked and not selected:
-            should_select = True
-        elif treepath == self._last_clicked and selected:
-            should_select = True
+        # recycled widgets can't be left in the middle of a rename
+        if row is self._renaming:
+            self._on_rename_finished()
 
-        if treepath == self._last_clicked:
-            self._last_clicked = None
-            self._dont_activate = True
+        self._cells.pop(row, None)
 
-        return should_select
+    def _add_long_press(self, widget, cell):
+        gesture = Gtk.GestureLongPress.new()
+        gesture.connect("pressed", self._on_long_pressed, cell)
+        widget.add_controller(gesture)
 
-    def _on_row_activated(self, treeview, treepath, treecolumn, data=None):
+    def _on_selection_changed(self, selection, position, n_items):
+        self._update_mode()
+        self.emit("selected")
+
+    def _on_row_activated(self, view, position):
+        # the same press that started selecting
         if self._dont_activate is True:
             self._dont_activate = False
             return
-        if self.selection.get_mode() == Gtk.SelectionMode.NONE:
-            path = self._get_path(self.sorted, treepath)
-            self.emit("activated", path)
-
-    def _on_clicked(self, gesture, n_press, x, y):
-        result = self.treeview.get_path_at_pos(x, y)
-        if result is None:
+        if self._is_editing:
             return
-        treepath, column, x, y = result
-        self._last_clicked = treepath
+        if self._selecting:
+            self._toggle_row(position)
+        else:
+            self.emit("activated", self.sorted.get_item(position).path)
+
+    def _toggle_row(self, position):
+        if self.selection.is_selected(position):
+            self.selection.unselect_item(position)
+        else:
+            self.selection.select_item(position, False)
+
+    def _start_rename(self, row):
+        stack = self._cells.get(row)
+        if stack is None:
+            return GLib.SOURCE_REMOVE
 
-    def _on_rename_started(self, cell_name, treepath, data=None):
+        self._renaming = row
+        stack.entry.set_text(row.name)
+        stack.set_visible_child(stack.entry)
+        stack.entry.grab_focus()
+        self._on_rename_started()
+
+        return GLib.SOURCE_REMOVE
+
+    def _on_rename_started(self):
         self._is_editing = True
         self.emit("rename-started")
 
-    def _on_rename_updated(self, cell_name, treepath, new_name, data=None):
-        old_path = self._get_path(self.sorted, treepath)
+    def _on_rename_activated(self, entry):
+        if self._renaming is not None:
+            self._on_rename_updated(self._renaming, entry.get_text())
+
+    def _on_rename_left(self, controller):
+        # leaving the entry keeps the new name
+        if self._renaming is not None:
+            self._on_rename_updated(self._renaming, controller.get_widget().get_text())
+
+    def _on_rename_key_pressed(self, controller, keyval, keycode, state):
+        if keyval != Gdk.KEY_Escape:
+            return False
+
+        self._on_rename_finished()
+        return True
+
+    def _on_rename_updated(self, row, new_name):
+        old_path = row.path
         directory = os.path.dirname(old_path)
         new_path = os.path.join(directory, new_name)
 
@@ -293,13 +450,11 @@ class PortfolioFiles(Gtk.ScrolledWindow):
 
             os.rename(old_path, new_path)
 
-            _treepath = Gtk.TreePath.new_from_string(treepath)
-            _treepath = self.sorted.convert_path_to_child_path(_treepath)
-            _treepath = self.filtered.convert_path_to_child_path(_treepath)
-
-            row = self.liststore.get_iter(_treepath)
-            self.liststore.set_value(row, self.PATH_COLUMN, new_path)
-            self.liststore.set_value(row, self.NAME_COLUMN, new_name)
+            info = utils.get_file_info(new_path)
+            icon = default_icons.get_icon(new_path, info)
+            self._update_row(row, icon, new_name, new_path, info)
+            self._lazy.discard(old_path)
+            self._rows[new_path] = self._rows.pop(old_path, row)
         except Exception as e:
             logger.debug(e)
             self.emit("rename-failed", new_name)
@@ -310,27 +465,27 @@ class PortfolioFiles(Gtk.ScrolledWindow):
         self._go_to_selection()
 
     def _on_rename_finished(self, *args):
-        self.name_cell.props.editable = False
+        # a renamed row can be unbound as it moves to its new position
+        if not self._is_editing:
+            return
+
+        row = self._renaming
+        self._renaming = None
+
+        stack = self._cells.get(row)
+        if stack is not None:
+            stack.set_visible_child(stack.label)
+
         self._is_editing = False
         self.emit("rename-finished")
 
-    def _on_long_pressed(self, gesture, x, y):
-        if self.selection.get_mode() == Gtk.SelectionMode.MULTIPLE:
+    def _on_long_pressed(self, gesture, x, y, cell):
+        if self._selecting:
             return
 
         self.switch_to_selection_mode()
-        path = self.treeview.get_path_at_pos(x, y)
-
-        if path is None:
-            self.switch_to_navigation_mode()
-            return
-
-        treepath = path[0]
-        self.selection.select_path(treepath)
-
-        # because of the custom selection rules, is not guaranteed
-        # that this will actually be selected so always update mode.
-        self._update_mode()
+        self._dont_activate = True
+        self.selection.select_item(cell.get_position(), False)
 
     def _on_adjustment_changed(self, adjustment):
         alloc = self.get_allocation()
@@ -339,34 +494,101 @@ class PortfolioFiles(Gtk.ScrolledWindow):
         )
         self.emit("adjustment-changed", reveal)
 
+        value = self._adjustment.get_value()
+        self._lazy_forward = value >= self._last_lazy_value
+        self._last_lazy_value = value
+
+    def _get_lazy_range(self):
+        if not self._bound:
+            return []
+
+        start = min(self._bound)
+        end = max(self._bound)
+        self._bound = []
+
+        # prefetch ahead of the scrolling direction
+        if self._lazy_forward:
+            ahead = range(end + 1, min(end + 1 + self.LAZY_PREFETCH, len(self.sorted)))
+        else:
+            ahead = range(start - 1, max(start - 1 - self.LAZY_PREFETCH, -1), -1)
+
+        return list(range(start, end + 1)) + list(ahead)
+
+    def _resolve_lazy_row(self, index):
+        row = self.sorted.get_item(index)
+
+        if row.path not in self._lazy:
+            return
+
+        self._lazy.discard(row.path)
+
+        # the loader already stat'ed it, only the name needs guessing
+        info = row.info
+        row.info = info._replace(
+            content_type=utils.get_content_type(row.name, info.is_dir, info.is_link)
+        )
+        row.icon = default_icons.get_icon(row.path, row.info)
+
+    def _on_lazy_step(self):
+        if self._lazy_queue is None:
+            self._lazy_queue = self._get_lazy_range()
+
+        for index in self._lazy_queue[: self.LAZY_BUFFER]:
+            if index < len(self.sorted):
+                self._resolve_lazy_row(index)
+
+        del self._lazy_queue[: self.LAZY_BUFFER]
+
+        if self._lazy_queue and self._lazy:
+            return GLib.SOURCE_CONTINUE
+
+        self._lazy_queue = None
+        self._lazy_handler_id = 0
+        return GLib.SOURCE_REMOVE
+
+    def _schedule_lazy(self):
+        # whatever was pending is not what the user is looking at anymore
+        self._cancel_lazy()
+
+        if not self._lazy or not self._bound:
+            return
+
+        self._lazy_handler_id = GLib.idle_add(
+            self._on_lazy_step, priority=GLib.PRIORITY_LOW
+        )
+
+    def _cancel_lazy(self):
+        if self._lazy_handler_id != 0:
+            GLib.Source.remove(self._lazy_handler_id)
+            self._lazy_handler_id = 0
+        self._lazy_queue = None
+
     def _update_mode(self):
-        count = self.selection.count_selected_rows()
-        if count == 0:
+        if self.selected_count == 0:
             self.switch_to_navigation_mode()
 
     def _select_row(self, row):
-        self._force_select = True
-        self.selection.select_iter(row)
-        self._force_select = False
+        position = self._get_position(row)
+        if position is not None:
+            self.selection.select_item(position, False)
 
     def select_all(self):
-        self._force_select = True
         self.selection.select_all()
-        self._force_select = False
 
     def unselect_all(self):
-        self._force_select = True
         self.selection.unselect_all()
-        self._force_select = False
 
     def switch_to_navigation_mode(self):
-        self.selection.set_mode(Gtk.SelectionMode.NONE)
+        self._selecting = False
+
+        if self.selected_count:
+            self.selection.unselect_all()
 
     def switch_to_selection_mode(self):
-        self.selection.set_mode(Gtk.SelectionMode.MULTIPLE)
+        self._selecting = True
 
     def update(self, sensitive):
-        self.treeview.props.sensitive = sensitive
+        self.view.props.sensitive = sensitive
 
     def update_scrolling(self):
         if self._to_select_row is not None:
@@ -378,27 +600,27 @@ class PortfolioFiles(Gtk.ScrolledWindow):
 
     def go_to_top(self):
         if len(self.sorted) >= 1:
-            self.treeview.scroll_to_cell(0, None, True, 0, 0)
+            self.view.scroll_to(0, None, Gtk.ListScrollFlags.NONE, None)
 
     def get_selection(self):
-        model, treepaths = self.selection.get_selected_rows()
-        selection = [
-            (
-                model[treepath][self.PATH_COLUMN],
-                Gtk.TreeRowReference.new(model, treepath),
-            )
-            for treepath in treepaths
-        ]
-        return selection
+        return [(row.path, row) for row in self._get_selected_rows()]
 
     def get_selected_path(self):
-        model, treepaths = self.selection.get_selected_rows()
-        treepath = treepaths[-1]
-        path = model[treepath][self.PATH_COLUMN]
-        return path
+        return self._get_selected_rows()[-1].path
+
+    def _add_row(self, icon, name, path, info):
+        # rows without an icon are resolved once they get near the viewport
+        if icon is None:
+            icon = default_icons.get_placeholder(info)
+            self._lazy.add(path)
 
-    def add_row(self, icon, name, path):
-        row = self.liststore.append([icon, name, path])
+        # the same file can be reported more than once, e.g. by the monitor
+        if path in self._rows:
+            self._update_row(self._rows[path], icon, name, path, info)
+            return None
+
+        row = self._new_row(icon, name, path, info)
+        self._rows[path] = row
 
         if self._to_select_path == path:
             self._to_select_row = row
@@ -406,6 +628,25 @@ class PortfolioFiles(Gtk.ScrolledWindow):
         if self._to_go_to_path == path:
             self._to_go_to_row = row
 
+        return row
+
+    def add_row(self, icon, name, path, info=None):
+        if info is None:
+            info = utils.get_file_info(path)
+
+        row = self._add_row(icon, name, path, info)
+        if row is not None:
+            self.liststore.append(row)
+
+    def add_rows(self, rows):
+        batch = [
+            self._add_row(icon, name, path, info) for name, path, icon, info in rows
+        ]
+
+        # the whole batch goes in as a single change
+        batch = [row for row in batch if row is not None]
+        self.liststore.splice(self.liststore.get_n_items(), 0, batch)
+
     def add_new_folder_row(self, directory):
         folder_name = utils.find_new_name(directory, _("New Folder"))
         path = os.path.join(directory, folder_name)
@@ -417,27 +658,67 @@ class PortfolioFiles(Gtk.ScrolledWindow):
             self.emit("add-failed")
             return
 
-        icon = utils.get_file_icon(path)
-        row = self.liststore.append([icon, folder_name, path])
+        info = utils.get_file_info(path)
+        icon = default_icons.get_icon(path, info)
+        row = self._new_row(icon, folder_name, path, info)
+        self._rows[path] = row
+        self.liststore.append(row)
         self._select_and_go(row, edit=True)
 
-    def remove_row(self, row):
-        if row is None or not row.valid():
+    def update_path(self, path):
+        row = self._rows.get(path)
+
+        if not os.path.lexists(path):
+            if row is not None:
+                self._remove_row(row)
             return
 
-        treepath = row.get_path()
-        treepath = self.sorted.convert_path_to_child_path(treepath)
-        treepath = self.filtered.convert_path_to_child_path(treepath)
+        try:
+            info = utils.get_file_info(path)
+        except Exception as e:
+            logger.debug(e)
+            return
+
+        icon = default_icons.get_icon(path, info)
+        name = os.path.basename(path)
+
+        if row is None:
+            self.add_row(icon, name, path, info)
+        else:
+            self._lazy.discard(path)
+            self._update_row(row, icon, name, path, info)
+
+    def remove_row(self, row):
+        # it could have been renamed or removed in the meantime
+        if row is None or self._rows.get(row.path) is not row:
+            return
 
-        self.liststore.remove(self.liststore.get_iter(treepath))
+        self._remove_row(row)
 
     def rename_selected_row(self):
-        self.name_cell.props.editable = True
-        model, treepaths = self.selection.get_selected_rows()
-        treepath = treepaths[-1]
-        self.treeview.set_cursor_on_cell(
-            treepath, self.name_column, self.name_cell, True
-        )
+        row = self._get_selected_rows()[-1]
+        position = self._get_position(row)
+
+        self.view.scroll_to(position, self.name_column, Gtk.ListScrollFlags.FOCUS, None)
+        GLib.idle_add(self._start_rename, row)
+
+    def detach(self):
+        # keep the view and the sorting from tracking every single batch
+        self._detached = True
+        self.view.set_model(None)
+        self.sorted.set_sorter(None)
+
+    def attach(self):
+        if not self._detached:
+            return
+
+        self._detached = False
+        self._update_sort_column()
+        self.view.set_model(self.selection)
 
     def clear(self):
-        self.liststore.clear()
+        self._cancel_lazy()
+        self._lazy = set()
+        self._bound = []
+        self._rows = {}
+        self.liststore.remove_all()
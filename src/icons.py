@@ -0,0 +1,76 @@
+# icons.py
+#
+# Copyright 2026 Martin Abente Lahaye
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import threading
+
+from collections import OrderedDict
+
+from gi.repository import Gio, GLib, GObject
+
+from . import utils
+
+
+class PortfolioIcons(GObject.GObject):
+    __gtype_name__ = "PortfolioIcons"
+
+    MAX_ICONS = 256
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._icons = OrderedDict()
+        self._special = None
+
+    def _get_special_paths(self):
+        if self._special is not None:
+            return self._special
+
+        paths = [GLib.get_home_dir()]
+        for index in range(GLib.UserDirectory.N_DIRECTORIES):
+            paths.append(GLib.get_user_special_dir(GLib.UserDirectory(index)))
+
+        self._special = set([path for path in paths if path])
+        return self._special
+
+    def lookup(self, content_type):
+        with self._lock:
+            if content_type in self._icons:
+                self._icons.move_to_end(content_type)
+                return self._icons[content_type]
+
+            icon = Gio.content_type_get_icon(content_type)
+            self._icons[content_type] = icon
+
+            if len(self._icons) > self.MAX_ICONS:
+                self._icons.popitem(last=False)
+
+            return icon
+
+    def get_placeholder(self, info):
+        if info.is_dir:
+            return self.lookup("inode/directory")
+        return self.lookup("application/octet-stream")
+
+    def get_icon(self, path, info):
+        # special folders have their own icons
+        if info.is_dir and path in self._get_special_paths():
+            return utils.get_file_icon(path)
+
+        return self.lookup(info.content_type)
+
+
+default_icons = PortfolioIcons()
@@ -0,0 +1,139 @@
+# journal.py
+#
+# Copyright 2026 Martin Abente Lahaye
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import json
+import hashlib
+import threading
+
+from gi.repository import GLib
+
+from . import logger
+
+
+class PortfolioJournal(object):
+    COMPLETED = "c"
+    PARTIAL = "p"
+    DESTINATION = "d"
+
+    def __init__(self, paths, directory):
+        self._directory = directory
+        self._lock = threading.Lock()
+        self._file = None
+        self._completed = {}
+        self._partial = {}
+        self._destinations = {}
+
+        # the same selection pasted into the same directory
+        key = json.dumps([sorted(paths), directory]).encode()
+        name = hashlib.sha1(key).hexdigest()
+        self._path = os.path.join(self._get_journal_dir(), name)
+
+    def _get_journal_dir(self):
+        if "PORTFOLIO_XDG_CACHE_DIR" in os.environ:
+            cache_dir = os.environ.get("PORTFOLIO_XDG_CACHE_DIR")
+        else:
+            cache_dir = GLib.get_user_cache_dir()
+
+        return os.path.join(cache_dir, "portfolio", "journals")
+
+    def _load(self):
+        with open(self._path) as journal:
+            for line in journal:
+                try:
+                    kind, path, *values = json.loads(line)
+                except ValueError as e:
+                    # whatever was being written when it crashed
+                    logger.debug(e)
+                    continue
+
+                if kind == self.COMPLETED:
+                    self._completed[path] = tuple(values)
+                    self._partial.pop(path, None)
+                elif kind == self.PARTIAL:
+                    self._partial[path] = tuple(values)
+                elif kind == self.DESTINATION:
+                    self._destinations[values[0]] = path
+
+    def _write(self, kind, path, *values):
+        path = os.path.relpath(path, self._directory)
+        line = json.dumps([kind, path, *values], separators=(",", ":"))
+
+        with self._lock:
+            self._file.write(f"{line}\n")
+            self._file.flush()
+
+    def exists(self):
+        return os.path.exists(self._path)
+
+    def open(self, resume):
+        os.makedirs(os.path.dirname(self._path), exist_ok=True)
+
+        if resume and self.exists():
+            self._load()
+
+        self._file = open(self._path, "a" if resume else "w")
+
+    def is_completed(self, path, lstat):
+        size, mtime = self._completed.get(
+            os.path.relpath(path, self._directory), (None, None)
+        )
+
+        if size != lstat.st_size or mtime != lstat.st_mtime_ns:
+            return False
+
+        return os.path.isfile(path) and os.lstat(path).st_size == size
+
+    def get_offset(self, path, lstat):
+        offset, mtime = self._partial.get(
+            os.path.relpath(path, self._directory), (0, None)
+        )
+
+        if mtime != lstat.st_mtime_ns or not os.path.isfile(path):
+            return 0
+
+        return min(offset, os.lstat(path).st_size)
+
+    def get_destination(self, path):
+        destination = self._destinations.get(path)
+
+        if destination is None:
+            return None
+
+        return os.path.join(self._directory, destination)
+
+    def choose(self, path, destination):
+        self._write(self.DESTINATION, destination, path)
+
+    def complete(self, path, lstat):
+        self._write(self.COMPLETED, path, lstat.st_size, lstat.st_mtime_ns)
+
+    def advance(self, path, offset, lstat):
+        self._write(self.PARTIAL, path, offset, lstat.st_mtime_ns)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def remove(self):
+        self.close()
+
+        try:
+            os.unlink(self._path)
+        except OSError as e:
+            logger.debug(e)
@@ -0,0 +1,98 @@
+# monitor.py
+#
+# Copyright 2026 Martin Abente Lahaye
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+
+from gi.repository import Gio, GLib, GObject
+
+from . import logger
+from .cache import default_listings
+
+
+class PortfolioMonitor(GObject.GObject):
+    __gtype_name__ = "PortfolioMonitor"
+
+    __gsignals__ = {
+        "updated": (GObject.SignalFlags.RUN_LAST, bool, (object,)),
+    }
+
+    INTERVAL = 250
+    MAX_PATHS = 500
+
+    def __init__(self, directory):
+        super().__init__()
+        self._directory = directory
+        self._pending = {}
+        self._monitor = None
+        self._flush_handler_id = 0
+
+        try:
+            self._monitor = Gio.File.new_for_path(directory).monitor_directory(
+                Gio.FileMonitorFlags.WATCH_MOVES, None
+            )
+            self._monitor.connect("changed", self._on_changed)
+        except Exception as e:
+            logger.debug(e)
+
+    def _on_changed(self, monitor, file, other_file, event):
+        if event == Gio.FileMonitorEvent.CHANGES_DONE_HINT:
+            return
+
+        for _file in [file, other_file]:
+            if _file is None:
+                continue
+
+            path = _file.get_path()
+            if path is None or os.path.dirname(path) != self._directory:
+                continue
+
+            self._pending[path] = None
+
+        # whatever was cached for this directory can't be trusted anymore
+        default_listings.invalidate(self._directory)
+
+        # bursts are collected and reported together
+        if not self._flush_handler_id:
+            self._flush_handler_id = GLib.timeout_add(self.INTERVAL, self._on_flush)
+
+    def _on_flush(self):
+        # large bursts are spread over several flushes
+        paths = list(self._pending)[: self.MAX_PATHS]
+
+        # nobody could handle these yet, so try again later
+        if paths and not self.emit("updated", paths):
+            return GLib.SOURCE_CONTINUE
+
+        for path in paths:
+            self._pending.pop(path, None)
+
+        if self._pending:
+            return GLib.SOURCE_CONTINUE
+
+        self._flush_handler_id = 0
+        return GLib.SOURCE_REMOVE
+
+    def stop(self):
+        if self._flush_handler_id:
+            GLib.Source.remove(self._flush_handler_id)
+            self._flush_handler_id = 0
+
+        if self._monitor is not None:
+            self._monitor.cancel()
+            self._monitor = None
+
+        self._pending = {}
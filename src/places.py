@@ -192,6 +192,9 @@ class PortfolioPlaces(Gtk.Stack):
 
         self._update_visibility()
 
+    def has_device(self, path):
+        return self._devices.has_device(path)
+
     def _update_visibility(self):
         self._update_stack_visibility()
         self._update_places_group_visibility()
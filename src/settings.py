@@ -24,6 +24,12 @@ class PortfolioSettings(GObject.GObject):
     SCHEMA = "dev.tchx84.Portfolio"
     ALPHABETICAL_ORDER = "alphabetical"
     MODIFIED_TIME_ORDER = "modified_time"
+    LOAD_BUDGET = 8
+    LISTING_CACHE_SIZE = 100000
+    BLOCK_DURABILITY = "block"
+    FILE_DURABILITY = "file"
+    SYNCFS_DURABILITY = "syncfs"
+    NO_DURABILITY = "none"
 
     def __init__(self):
         super().__init__()
@@ -55,3 +61,69 @@ class PortfolioSettings(GObject.GObject):
             return
         value = [self.ALPHABETICAL_ORDER, self.MODIFIED_TIME_ORDER].index(value)
         self._settings.set_enum("sort-order", value)
+
+    @GObject.Property(type=int, default=LOAD_BUDGET)
+    def load_budget(self):
+        if self._settings is None:
+            return self.LOAD_BUDGET
+        return self._settings.get_int("load-budget")
+
+    @load_budget.setter
+    def load_budget(self, value):
+        if self._settings is None:
+            return
+        self._settings.set_int("load-budget", value)
+
+    @GObject.Property(type=int, default=LISTING_CACHE_SIZE)
+    def listing_cache_size(self):
+        if self._settings is None:
+            return self.LISTING_CACHE_SIZE
+        return self._settings.get_int("listing-cache-size")
+
+    @listing_cache_size.setter
+    def listing_cache_size(self, value):
+        if self._settings is None:
+            return
+        self._settings.set_int("listing-cache-size", value)
+
+    @GObject.Property(type=str)
+    def durability(self):
+        if self._settings is None:
+            return self.BLOCK_DURABILITY
+        return self._settings.get_string("durability")
+
+    @durability.setter
+    def durability(self, value):
+        if self._settings is None:
+            return
+        value = [
+            self.BLOCK_DURABILITY,
+            self.FILE_DURABILITY,
+            self.SYNCFS_DURABILITY,
+            self.NO_DURABILITY,
+        ].index(value)
+        self._settings.set_enum("durability", value)
+
+    @GObject.Property(type=bool, default=False)
+    def streaming(self):
+        if self._settings is None:
+            return False
+        return self._settings.get_boolean("streaming")
+
+    @streaming.setter
+    def streaming(self, value):
+        if self._settings is None:
+            return
+        self._settings.set_boolean("streaming", value)
+
+    @GObject.Property(type=bool, default=False)
+    def verify(self):
+        if self._settings is None:
+            return False
+        return self._settings.get_boolean("verify")
+
+    @verify.setter
+    def verify(self, value):
+        if self._settings is None:
+            return
+        self._settings.set_boolean("verify", value)
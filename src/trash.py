@@ -186,6 +186,8 @@ class PortfolioTrash(GObject.GObject):
         os.remove(info_path)
         shutil.move(path, orig_path)
 
+        return orig_path
+
     def remove(self, path):
         info_path = self.get_info_path(path)
         os.remove(info_path)
@@ -17,9 +17,14 @@
 
 import os
 import re
+import stat
+import ctypes
+
+from collections import namedtuple
 
 from gi.repository import GLib, Gio
 
+from . import logger
 from .cache import cached
 
 
@@ -37,16 +42,6 @@ def find_new_name(directory, name, fmt="%s(%d)"):
     return name
 
 
-def count(path):
-    _count = 1
-
-    if os.path.isdir(path):
-        for directory, dirs, files in os.walk(path):
-            _count += len(files)
-
-    return _count
-
-
 def flatten_walk(path):
     _paths = []
 
@@ -87,16 +82,55 @@ def get_path_for_xdg(directory):
     return path
 
 
-@cached
-def get_file_mtime(string):
-    return os.lstat(string).st_mtime
-
-
 @cached
 def is_file_dir(string):
     return os.path.isdir(string)
 
 
+FileInfo = namedtuple(
+    "FileInfo", ["is_dir", "size", "mtime", "content_type", "is_link"]
+)
+
+
+def get_content_type(name, is_dir, is_link):
+    if is_link:
+        return "inode/symlink"
+    if is_dir:
+        return "inode/directory"
+
+    # guess from the name alone, no need to read the file
+    content_type, uncertain = Gio.content_type_guess(name, None)
+    return content_type
+
+
+def get_entry_info(entry, lazy=False):
+    # symbolic links to directories still behave as directories
+    is_dir = entry.is_dir()
+    is_link = entry.is_symlink()
+    _stat = entry.stat(follow_symlinks=False)
+
+    if lazy:
+        content_type = None
+    else:
+        content_type = get_content_type(entry.name, is_dir, is_link)
+
+    return FileInfo(is_dir, _stat.st_size, _stat.st_mtime, content_type, is_link)
+
+
+def get_file_info(path):
+    _stat = os.lstat(path)
+    is_link = stat.S_ISLNK(_stat.st_mode)
+    is_dir = os.path.isdir(path) if is_link else stat.S_ISDIR(_stat.st_mode)
+
+    return FileInfo(
+        is_dir,
+        _stat.st_size,
+        _stat.st_mtime,
+        get_content_type(os.path.basename(path), is_dir, is_link),
+        is_link,
+    )
+
+
 def get_file_icon(path):
     return (
         Gio.file_new_for_path(path)
@@ -118,6 +152,21 @@ def sync_folder(path):
     os.close(fd)
 
 
+def sync_filesystem(path):
+    fd = os.open(path, os.O_RDONLY)
+
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.syncfs(fd) != 0:
+            raise OSError(ctypes.get_errno(), "syncfs failed")
+    except (AttributeError, OSError) as e:
+        # syncing every filesystem is slower but just as safe
+        logger.debug(e)
+        os.sync()
+    finally:
+        os.close(fd)
+
+
 def find_mount_point(path):
     path = os.path.abspath(path)
     while not os.path.ismount(path):
@@ -134,6 +183,14 @@ def get_size_for_humans(num):
     return "%.1f%sB" % (num, "Y")
 
 
+def get_time_for_humans(seconds):
+    if seconds < 60:
+        return "%d s" % seconds
+    if seconds < 3600:
+        return "%d min" % round(seconds / 60)
+    return "%d h %d min" % divmod(round(seconds / 60), 60)
+
+
 def find_child_by_id(container, child_id):
     for widget in list(container):
         if widget.get_buildable_id() == child_id:
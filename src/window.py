@@ -24,8 +24,10 @@ from gi.repository import Adw, Gtk, GLib
 from . import utils
 from . import logger
 from .popup import PortfolioPopup
+from .journal import PortfolioJournal
 from .worker import PortfolioCutWorker
 from .worker import PortfolioCopyWorker
+from .worker import PortfolioPlanWorker
 from .worker import PortfolioDeleteWorker
 from .worker import PortfolioLoadWorker
 from .worker import PortfolioOpenWorker
@@ -41,9 +43,11 @@ from .passphrase import PortfolioPassphrase
 from .placeholder import PortfolioPlaceholder
 from .loading import PortfolioLoading
 from .files import PortfolioFiles
+from .monitor import PortfolioMonitor
 from .menu import PortfolioMenu
 from .settings import PortfolioSettings
 from .trash import default_trash
+from .cache import default_listings
 
 
 @Gtk.Template(resource_path="/dev/tchx84/Portfolio/window.ui")
@@ -122,6 +126,8 @@ class PortfolioWindow(Adw.ApplicationWindow):
         self._popup = None
         self._places_popup = None
         self._worker = None
+        self._monitor = None
+        self._mismatched = []
         self._busy = False
         self._to_copy = []
         self._to_cut = []
@@ -134,6 +140,10 @@ class PortfolioWindow(Adw.ApplicationWindow):
         self._settings = PortfolioSettings()
         self._settings.connect("notify::show-hidden", self._on_show_hidden_changed)
         self._settings.connect("notify::sort-order", self._on_sort_order_changed)
+        self._settings.connect(
+            "notify::listing-cache-size", self._on_listing_cache_size_changed
+        )
+        default_listings.resize(self._settings.listing_cache_size)
 
         self.previous.connect("clicked", self._on_go_previous)
         self.next.connect("clicked", self._on_go_next)
@@ -180,15 +190,16 @@ class PortfolioWindow(Adw.ApplicationWindow):
         self.files.connect("add-failed", self._on_files_add_failed)
         self.files.connect("adjustment-changed", self._on_files_adjustment_changed)
         self.files.sort_order = self._settings.sort_order
+        self.files.show_hidden = self._settings.show_hidden
         self.content_inner_box.append(self.files)
 
-        places = PortfolioPlaces()
-        places.connect("updated", self._on_places_updated)
-        places.connect("removing", self._on_places_removing)
-        places.connect("removed", self._on_places_removed)
-        places.connect("failed", self._on_places_failed)
-        places.connect("unlock", self._on_places_unlock)
-        self.places_inner_box.append(places)
+        self._places = PortfolioPlaces()
+        self._places.connect("updated", self._on_places_updated)
+        self._places.connect("removing", self._on_places_removing)
+        self._places.connect("removed", self._on_places_removed)
+        self._places.connect("failed", self._on_places_failed)
+        self._places.connect("unlock", self._on_places_unlock)
+        self.places_inner_box.append(self._places)
 
         self._properties_worker = PortfolioPropertiesWorker()
         self.properties_inner_box.append(PortfolioProperties(self._properties_worker))
@@ -213,28 +224,52 @@ class PortfolioWindow(Adw.ApplicationWindow):
         if self._worker is not None:
             self._worker.stop()
 
+        if self._monitor is not None:
+            self._monitor.stop()
+            self._monitor = None
+
         if default_trash.is_trash(directory):
             loader_class = PortfolioLoadTrashWorker
         else:
             loader_class = PortfolioLoadWorker
+            self._monitor = PortfolioMonitor(directory)
+            self._monitor.connect("updated", self._on_monitor_updated)
 
-        self._worker = loader_class(directory, self._settings.show_hidden)
+        self._worker = loader_class(directory, self._settings.load_budget)
         self._worker.connect("started", self._on_load_started)
         self._worker.connect("updated", self._on_load_updated)
         self._worker.connect("finished", self._on_load_finished)
         self._worker.connect("failed", self._on_load_failed)
         self._worker.start()
 
-    def _paste(self, Worker, to_paste):
+    def _paste(self, Worker, to_paste, resume=False, plan=None):
         directory = self._history[self._index]
 
-        self._worker = Worker(to_paste, directory)
+        # removable devices can be pulled out at any moment
+        if self._places.has_device(directory):
+            durability = PortfolioSettings.BLOCK_DURABILITY
+            streaming = True
+        else:
+            durability = self._settings.durability
+            streaming = self._settings.streaming
+
+        self._mismatched = []
+        self._worker = Worker(
+            to_paste,
+            directory,
+            durability,
+            streaming,
+            resume,
+            plan,
+            self._settings.verify,
+        )
         self._worker.connect("started", self._on_paste_started)
         self._worker.connect("updated", self._on_paste_updated)
         self._worker.connect("post-update", self._on_paste_post_updated)
         self._worker.connect("finished", self._on_paste_finished)
         self._worker.connect("failed", self._on_paste_failed)
         self._worker.connect("stopped", self._on_paste_stopped)
+        self._worker.connect("mismatched", self._on_paste_mismatched)
         self._worker.start()
 
     def _paste_finish(self):
@@ -294,10 +329,6 @@ class PortfolioWindow(Adw.ApplicationWindow):
         self._index = -1
         self._move(path, False)
 
-    def _refresh(self):
-        if self._index > -1:
-            self._move(self._history[self._index], True)
-
     def _notify(self, description, on_confirm, on_cancel, on_trash, autoclose, data):
         self._clean_popups()
 
@@ -538,6 +569,7 @@ class PortfolioWindow(Adw.ApplicationWindow):
         self._busy = True
 
         self.files.clear()
+        self.files.detach()
         self._update_directory_title()
         self._reset_search()
         self._update_all()
@@ -557,16 +589,16 @@ class PortfolioWindow(Adw.ApplicationWindow):
         return GLib.SOURCE_REMOVE
 
     def _on_load_updated(self, worker, directory, found, index, total):
-        for name, path, icon in found:
-            self.files.add_row(icon, name, path)
+        self.files.add_rows(found)
 
-        self.loading.update(progress=(index + 1) / total)
+        self.loading.update(progress=index / total)
 
     def _on_load_finished(self, worker, directory):
         self._busy = False
         self._clean_workers()
         self._clean_loading_delay()
 
+        self.files.attach()
         self._update_all()
         self.files.update_scrolling()
 
@@ -574,6 +606,7 @@ class PortfolioWindow(Adw.ApplicationWindow):
         self._busy = False
         self._clean_workers()
         self._clean_loading_delay()
+        self.files.attach()
 
         name = os.path.basename(directory)
         self.loading.update(
@@ -586,6 +619,17 @@ class PortfolioWindow(Adw.ApplicationWindow):
         self.action_stack.set_visible_child(self.close_box)
         self.tools_stack.set_visible_child(self.close_tools)
 
+    def _on_monitor_updated(self, monitor, paths):
+        # let ongoing operations settle first
+        if self._busy or self.files.is_editing:
+            return False
+
+        for path in paths:
+            self.files.update_path(path)
+
+        self._update_all()
+        return True
+
     def _on_go_previous(self, button):
         if self._index == 0:
             self._go_back_to_homepage()
@@ -679,6 +723,25 @@ class PortfolioWindow(Adw.ApplicationWindow):
         Worker = PortfolioCopyWorker if self._to_copy else PortfolioCutWorker
 
         directory = self._history[self._index]
+
+        # an interrupted copy of the same selection can be picked up
+        journal = PortfolioJournal([path for path, ref in to_paste], directory)
+        if Worker is PortfolioCopyWorker and journal.exists():
+            self._notify(
+                _("Resume the interrupted paste?"),
+                self._on_resume_confirmed,
+                self._on_resume_declined,
+                None,
+                False,
+                (to_paste, Worker),
+            )
+            return
+
+        self._check_paste(Worker, to_paste)
+
+    def _check_paste(self, Worker, to_paste):
+        directory = self._history[self._index]
+
         should_warn = any(
             [
                 os.path.dirname(path) != directory
@@ -691,19 +754,87 @@ class PortfolioWindow(Adw.ApplicationWindow):
             self._paste(Worker, to_paste)
             return
 
+        # find out exactly what will be overwritten before asking
+        self._worker = PortfolioPlanWorker(Worker, to_paste, directory)
+        self._worker.connect("started", self._on_plan_started)
+        self._worker.connect("finished", self._on_plan_finished, to_paste, Worker)
+        self._worker.connect("failed", self._on_paste_failed)
+        self._worker.connect("stopped", self._on_plan_stopped)
+        self._worker.start()
+
+    def _on_plan_started(self, worker):
+        self._busy = True
+        self.loading.update(_("Checking"), 0.0, "", "")
+        self.content_stack.set_visible_child(self.loading_box)
+
+        self._update_all()
+
+        self.action_stack.set_visible_child(self.stop_box)
+        self.tools_stack.set_visible_child(self.stop_tools)
+
+    def _on_plan_finished(self, worker, plan, to_paste, Worker):
+        self._on_plan_stopped(worker)
+
+        required = utils.get_size_for_humans(plan.required_bytes)
+
+        if plan.available_bytes is not None:
+            available = utils.get_size_for_humans(plan.available_bytes)
+            if plan.required_bytes > plan.available_bytes:
+                self._notify(
+                    _("Not enough space, %s needed but only %s free")
+                    % (required, available),
+                    None,
+                    self._on_popup_closed,
+                    None,
+                    True,
+                    None,
+                )
+                return
+
+        if plan.overwritten == 1:
+            description = _("1 file will be overwritten")
+        else:
+            description = _("%d files will be overwritten") % plan.overwritten
+        description = _("%s, %d added") % (
+            description,
+            plan.total - plan.overwritten,
+        )
+        if plan.deleted:
+            description = _("%s, %d deleted") % (description, plan.deleted)
+        if plan.skipped:
+            description = _("%s, %d skipped") % (description, plan.skipped)
+        description = _("%s, %s needed, proceed?") % (description, required)
+
         self._notify(
-            _("Files will be overwritten, proceed?"),
+            description,
             self._on_paste_confirmed,
             self._on_popup_closed,
             None,
             False,
-            (to_paste, Worker),
+            (to_paste, Worker, plan),
         )
 
+    def _on_plan_stopped(self, worker):
+        self._busy = False
+        self._clean_workers()
+        self.loading.clean()
+        self._update_all()
+
     def _on_paste_confirmed(self, button, popup, data):
+        to_paste, Worker, plan = data
+        self._clean_popups()
+        self._paste(Worker, to_paste, plan=plan)
+
+    def _on_resume_confirmed(self, button, popup, data):
         to_paste, Worker = data
         self._clean_popups()
-        self._paste(Worker, to_paste)
+        self._paste(Worker, to_paste, True)
+
+    def _on_resume_declined(self, button, popup, data):
+        to_paste, Worker = data
+        self._clean_popups()
+        # starting over can still overwrite what is already there
+        self._check_paste(Worker, to_paste)
 
     def _on_paste_started(self, worker, total):
         self._busy = True
@@ -724,19 +855,83 @@ class PortfolioWindow(Adw.ApplicationWindow):
 
         self.files.add_row(icon, name, path)
 
-    def _on_paste_updated(self, worker, path, index, total, current_bytes, total_bytes):
-        description = os.path.basename(path)
-        human_current_bytes = utils.get_size_for_humans(current_bytes)
+    def _on_paste_updated(
+        self, worker, path, index, total, done_bytes, total_bytes, rate, eta
+    ):
+        # totals are not final until the whole selection was walked
+        if worker.props.discovering:
+            count = _("%d of at least %d") % (index, total)
+        else:
+            count = _("%d of %d") % (index, total)
+        description = _("%s, %s") % (os.path.basename(path), count)
+
+        human_done_bytes = utils.get_size_for_humans(done_bytes)
         human_total_bytes = utils.get_size_for_humans(total_bytes)
+        details = [_("%s of %s") % (human_done_bytes, human_total_bytes)]
+
+        if rate:
+            details.append(_("%s/s") % utils.get_size_for_humans(rate))
+        if eta >= 0:
+            details.append(_("%s left") % utils.get_time_for_humans(eta))
+
+        methods = {
+            PortfolioCopyWorker.REFLINK_METHOD: _("cloned"),
+            PortfolioCopyWorker.COPY_FILE_RANGE_METHOD: _("copied in kernel"),
+            PortfolioCopyWorker.SENDFILE_METHOD: _("copied"),
+        }
+
+        method = methods.get(worker.props.method)
+        if method is not None:
+            details.append(method)
+
+        # moves within the same filesystem have no bytes to go by
+        if total_bytes:
+            progress = min(done_bytes / total_bytes, 1.0)
+        else:
+            progress = index / total if total else 0.0
+
         self.loading.update(
             description=description,
-            progress=index / total,
-            details=_("%s of %s") % (human_current_bytes, human_total_bytes),
+            progress=progress,
+            details=" \u2014 ".join(details),
         )
 
     def _on_paste_finished(self, worker, total):
+        saved_bytes = worker.props.saved_bytes
         self._paste_finish()
 
+        if not self._mismatched and saved_bytes:
+            self._notify(
+                _("%s saved by keeping hard links")
+                % utils.get_size_for_humans(saved_bytes),
+                None,
+                None,
+                None,
+                True,
+                None,
+            )
+            return
+
+        if not self._mismatched:
+            return
+
+        if len(self._mismatched) == 1:
+            name = os.path.basename(self._mismatched[0])
+        else:
+            name = _("%d files") % len(self._mismatched)
+
+        self._notify(
+            _("%s did not match the original") % name,
+            None,
+            self._on_popup_closed,
+            None,
+            False,
+            None,
+        )
+
+    def _on_paste_mismatched(self, worker, path):
+        self._mismatched.append(path)
+
     def _on_paste_failed(self, worker, path):
         self._busy = False
         self._clean_workers()
@@ -753,8 +948,6 @@ class PortfolioWindow(Adw.ApplicationWindow):
 
     def _on_paste_stopped(self, worker):
         self._paste_finish()
-        # XXX nuclear fix for when parent directory does not get to be updated
-        self._refresh()
 
     def _on_trash_instead(self, button, popup, selection):
         self._clean_popups()
@@ -1045,11 +1238,14 @@ class PortfolioWindow(Adw.ApplicationWindow):
         self.content_deck.set_visible_child(self.files_stack)
 
     def _on_show_hidden_changed(self, settings, data):
-        self._refresh()
+        self.files.show_hidden = self._settings.show_hidden
+        self._update_all()
 
     def _on_sort_order_changed(self, settings, data):
         self.files.sort_order = self._settings.sort_order
-        self._refresh()
+
+    def _on_listing_cache_size_changed(self, settings, data):
+        default_listings.resize(self._settings.listing_cache_size)
 
     def _on_menu_button_clicked(self, button):
         button.props.popover.popup()
@@ -1065,6 +1261,8 @@ class PortfolioWindow(Adw.ApplicationWindow):
     def _on_close_request(self, window):
         if self._worker is not None:
             self._worker.stop()
+        if self._monitor is not None:
+            self._monitor.stop()
         self._properties_worker.stop()
 
     def open(self, path=PortfolioPlaces.PORTFOLIO_HOME_DIR, force_page_switch=False):
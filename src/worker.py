@@ -18,12 +18,19 @@
 import os
 import sys
 import stat
+import errno
 import time
+import queue
+import fcntl
 import shutil
+import hashlib
 import locale
 import datetime
 import threading
 
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
 from pwd import getpwuid
 from grp import getgrgid
 
@@ -31,7 +38,9 @@ from gi.repository import Gio, GObject, GLib
 
 from . import utils
 from . import logger
-from .cache import default_cache
+from .cache import default_cache, default_listings
+from .icons import default_icons
+from .journal import PortfolioJournal
 from .translation import gettext as _
 from .trash import default_trash
 
@@ -40,6 +49,23 @@ class WorkerStoppedException(Exception):
     pass
 
 
+PastePlan = namedtuple(
+    "PastePlan",
+    [
+        "renames",
+        "tops",
+        "items",
+        "total",
+        "overwritten",
+        "deleted",
+        "skipped",
+        "total_bytes",
+        "required_bytes",
+        "available_bytes",
+    ],
+)
+
+
 class CachedWorker(object):
     def __init__(self):
         default_cache.activate()
@@ -51,10 +77,16 @@ class CachedWorker(object):
 class PortfolioWorker(threading.Thread, GObject.GObject):
     __gtype_name__ = "PortfolioWorker"
 
+    # progress flushes per second
+    FLUSH_RATE = 10
+
     def __init__(self):
         threading.Thread.__init__(self)
         GObject.GObject.__init__(self)
         self._cancellable = Gio.Cancellable()
+        self._emit_lock = threading.Lock()
+        self._pending_update = None
+        self._flush_handler_id = None
 
     def _progress(self, current, total):
         logger.debug(current, total)
@@ -67,8 +99,35 @@ class PortfolioWorker(threading.Thread, GObject.GObject):
         if not self._cancellable.is_cancelled():
             self._cancellable.cancel()
 
+    def _flush(self):
+        with self._emit_lock:
+            self._flush_handler_id = None
+
+            # queued behind anything emitted before it
+            if self._pending_update is not None:
+                GLib.idle_add(GObject.GObject.emit, self, *self._pending_update)
+                self._pending_update = None
+
+        return GLib.SOURCE_REMOVE
+
     def emit(self, *args):
-        GLib.idle_add(GObject.GObject.emit, self, *args)
+        with self._emit_lock:
+            # only the latest progress is worth showing
+            if args[0] == "updated":
+                self._pending_update = args
+                if self._flush_handler_id is None:
+                    self._flush_handler_id = GLib.timeout_add(
+                        1000 // self.FLUSH_RATE, self._flush
+                    )
+                return
+
+            # anything else goes after the progress that preceded it
+            pending = self._pending_update
+            self._pending_update = None
+
+            if pending is not None:
+                GLib.idle_add(GObject.GObject.emit, self, *pending)
+            GLib.idle_add(GObject.GObject.emit, self, *args)
 
 
 class PortfolioCopyWorker(PortfolioWorker):
@@ -76,32 +135,268 @@ class PortfolioCopyWorker(PortfolioWorker):
 
     __gsignals__ = {
         "started": (GObject.SignalFlags.RUN_LAST, None, (int,)),
-        "updated": (GObject.SignalFlags.RUN_LAST, None, (str, int, int, float, float)),
+        "updated": (
+            GObject.SignalFlags.RUN_LAST,
+            None,
+            (str, int, int, float, float, float, float),
+        ),
         "post-update": (GObject.SignalFlags.RUN_LAST, None, (str, str, object, bool)),
         "finished": (GObject.SignalFlags.RUN_LAST, None, (int,)),
         "failed": (GObject.SignalFlags.RUN_LAST, None, (str,)),
         "stopped": (GObject.SignalFlags.RUN_LAST, None, ()),
+        "mismatched": (GObject.SignalFlags.RUN_LAST, None, (str,)),
     }
 
-    def __init__(self, selection, directory=None):
+    WORKERS = 4
+    REPORT_INTERVAL = 0.25
+    SMOOTHING = 0.2
+    QUEUE_SIZE = 10000
+    FOLLOW_LINKS = True
+    JOURNALED = True
+    VERIFIED = True
+    HASH_BLOCK = 2**20
+
+    # _IOW(0x94, 9, int)
+    FICLONE = 0x40049409
+
+    REFLINK_METHOD = "reflink"
+    COPY_FILE_RANGE_METHOD = "copy_file_range"
+    SENDFILE_METHOD = "sendfile"
+
+    METHODS = [REFLINK_METHOD, COPY_FILE_RANGE_METHOD, SENDFILE_METHOD]
+
+    BLOCK_DURABILITY = "block"
+    FILE_DURABILITY = "file"
+    SYNCFS_DURABILITY = "syncfs"
+    NO_DURABILITY = "none"
+
+    def __init__(
+        self,
+        selection,
+        directory=None,
+        durability=BLOCK_DURABILITY,
+        streaming=False,
+        resume=False,
+        plan=None,
+        verify=False,
+    ):
         super().__init__()
         self._selection = selection
         self._directory = directory
-        self._copy_was_called = False
+        self._durability = durability
+        self._streaming = streaming
+        self._resume = resume
+        self._plan = plan
+        self._verify = verify and self.VERIFIED
+        self._verifier = None
+        self._verifications = []
+        self._journal = None
+        self._saved_bytes = 0
+        self._method = ""
+        self._methods = {}
+        self._discovering = False
+        self._lock = threading.Lock()
+        self._done = threading.Event()
 
-    def _report_status(self, path, current_bytes, total_bytes):
-        self.emit(
-            "updated",
-            path,
-            self._count,
-            self._total,
-            current_bytes,
-            total_bytes,
-        )
+    @GObject.Property(type=str)
+    def method(self):
+        return self._method
+
+    @GObject.Property(type=bool, default=False)
+    def discovering(self):
+        return self._discovering
+
+    @GObject.Property(type=float, default=0)
+    def saved_bytes(self):
+        return self._saved_bytes
+
+    def _report_status(self, path, force=False):
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._last_report
+
+            if elapsed < self.REPORT_INTERVAL and not force:
+                return
+
+            # short intervals make for noisy samples
+            if elapsed >= self.REPORT_INTERVAL:
+                rate = (self._done_bytes - self._last_done_bytes) / elapsed
+                if self._rate:
+                    rate = self.SMOOTHING * rate + (1 - self.SMOOTHING) * self._rate
+                self._rate = rate
+                self._last_report = now
+                self._last_done_bytes = self._done_bytes
+
+            remaining_bytes = max(self._total_bytes - self._done_bytes, 0)
+            eta = remaining_bytes / self._rate if self._rate else -1.0
+
+            self.emit(
+                "updated",
+                path,
+                self._count,
+                max(self._count, self._total),
+                self._done_bytes,
+                max(self._done_bytes, self._total_bytes),
+                self._rate,
+                eta,
+            )
+
+    def _advance(self, path, length):
+        with self._lock:
+            self._done_bytes += length
+
+        self._report_status(path)
+
+    def _clone(self, infd, outfd):
+        try:
+            fcntl.ioctl(outfd, self.FICLONE, infd)
+        except OSError as e:
+            logger.debug(e)
+            return False
+
+        return True
+
+    def _transfer(self, method, infd, outfd, offset, count):
+        if method == self.COPY_FILE_RANGE_METHOD:
+            return os.copy_file_range(infd, outfd, count, offset, offset)
+
+        # sendfile writes wherever the destination is at
+        os.lseek(outfd, offset, os.SEEK_SET)
+
+        # assume kernel >= 2.6.33
+        return os.sendfile(outfd, infd, offset, count)
+
+    def _sync_file(self, fd):
+        if self._durability in [self.BLOCK_DURABILITY, self.FILE_DURABILITY]:
+            os.fsync(fd)
+
+    def _sync_folder(self, path):
+        if self._durability in [self.BLOCK_DURABILITY, self.FILE_DURABILITY]:
+            utils.sync_folder(path)
+
+    def _sync_filesystem(self):
+        if self._durability == self.SYNCFS_DURABILITY:
+            utils.sync_filesystem(self._directory)
+
+    def _set_method(self, path, method):
+        logger.debug(f"copying {path} with {method}")
+
+        # copies run ahead of the one being reported
+        with self._lock:
+            self._methods[path] = method
+
+    def _advise(self, fd, offset, length, advice):
+        if not self._streaming or not hasattr(os, advice):
+            return
+
+        try:
+            os.posix_fadvise(fd, offset, length, getattr(os, advice))
+        except OSError as e:
+            logger.debug(e)
+
+    def _release(self, infd, outfd, offset, length):
+        # written pages can only be dropped once they are on disk
+        if self._durability != self.BLOCK_DURABILITY:
+            os.fdatasync(outfd)
+
+        # keep the page cache for whatever else the user is doing
+        self._advise(outfd, offset, length, "POSIX_FADV_DONTNEED")
+        self._advise(infd, offset, length, "POSIX_FADV_DONTNEED")
+
+    def _is_sparse(self, fd, size):
+        return os.fstat(fd).st_blocks * 512 < size
+
+    def _preallocate(self, fd, size):
+        if not hasattr(os, "posix_fallocate"):
+            return
+
+        try:
+            os.posix_fallocate(fd, 0, size)
+        except OSError as e:
+            if e.errno == errno.ENOSPC:
+                raise
+            logger.debug(e)
+
+    def _get_available_bytes(self):
+        try:
+            stat = os.statvfs(self._directory)
+        except Exception as e:
+            logger.debug(e)
+            return None
+
+        return stat.f_bavail * stat.f_frsize
+
+    def _check_space(self, required=None):
+        if required is None:
+            required = self._required
 
-    def _do_copy(self, source, destination):
-        current_bytes = 0
-        total_bytes = os.stat(source.name).st_size
+        # discovery tends to run ahead, so this usually fails before writing
+        if self._available is not None and required > self._available:
+            raise OSError(errno.ENOSPC, os.strerror(errno.ENOSPC), self._directory)
+
+    def _get_allocated_bytes(self, paths):
+        allocated = 0
+        inodes = set()
+
+        for path in paths:
+            lstat = os.lstat(path)
+
+            inode = (lstat.st_dev, lstat.st_ino)
+            if inode in inodes:
+                continue
+            inodes.add(inode)
+
+            allocated += min(lstat.st_size, lstat.st_blocks * 512)
+
+        return allocated
+
+    def _get_tree(self, path):
+        if not os.path.isdir(path) or os.path.islink(path):
+            yield path
+            return
+
+        for directory, dirs, files in os.walk(path):
+            for name in files:
+                yield os.path.join(directory, name)
+
+    def _make_room(self, path, destination, required):
+        top = (path, destination, True)
+        sources = (item[1] for item in self._walk([top]) if item[0] == "file")
+        required += self._get_allocated_bytes(sources)
+
+        # whatever gets overwritten gives its space back
+        if self._available is not None:
+            self._available += self._get_allocated_bytes(self._get_tree(destination))
+
+        # the destination can't be brought back once it is gone
+        self._check_space(required)
+
+    def _get_extents(self, fd, size, sparse):
+        # fully allocated files are a single extent
+        if not sparse:
+            yield 0, size
+            return
+
+        offset = 0
+        while offset < size:
+            try:
+                offset = os.lseek(fd, offset, os.SEEK_DATA)
+                end = os.lseek(fd, offset, os.SEEK_HOLE)
+            except OSError as e:
+                # nothing but a hole until the end
+                if e.errno == errno.ENXIO:
+                    return
+                # not every filesystem can tell where holes are
+                logger.debug(e)
+                yield offset, size
+                return
+
+            yield offset, end
+            offset = end
+
+    def _do_copy(self, source, destination, offset=0):
+        lstat = os.stat(source.name)
+        total_bytes = lstat.st_size
         arch_capped = sys.maxsize < 2**32
 
         # start with an arbitrary block size
@@ -112,58 +407,332 @@ class PortfolioCopyWorker(PortfolioWorker):
         outfd = destination.fileno()
         infd = source.fileno()
 
-        while True:
-            self._stop_check()
+        # whatever was copied before being interrupted
+        if offset:
+            self._advance(destination.name, offset)
+
+        # sharing extents with the source is instant when supported
+        if self.REFLINK_METHOD in self.METHODS and self._clone(infd, outfd):
+            self._set_method(destination.name, self.REFLINK_METHOD)
+            self._sync_file(outfd)
+            self._advance(destination.name, total_bytes - offset)
+            return
+
+        if self.COPY_FILE_RANGE_METHOD in self.METHODS and hasattr(
+            os, "copy_file_range"
+        ):
+            method = self.COPY_FILE_RANGE_METHOD
+        else:
+            method = self.SENDFILE_METHOD
+
+        self._set_method(destination.name, method)
 
-            # assume kernel >= 2.6.33
-            sent_bytes = os.sendfile(outfd, infd, current_bytes, block_bytes)
-            if sent_bytes == 0:
-                break
+        self._advise(infd, 0, 0, "POSIX_FADV_SEQUENTIAL")
 
-            # fsync frequency is indirectly controlled by the size of the block
+        # reserve the whole file up front so it does not get fragmented
+        sparse = self._is_sparse(infd, total_bytes)
+        if not sparse and total_bytes:
+            self._preallocate(outfd, total_bytes)
+
+        # holes are skipped, so only data extents get copied
+        copied_bytes = offset
+        current_bytes = offset
+        try:
+            for start, end in self._get_extents(infd, total_bytes, sparse):
+                if end <= offset:
+                    continue
+
+                current_bytes = max(start, offset)
+
+                while current_bytes < end:
+                    self._stop_check()
+
+                    try:
+                        sent_bytes = self._transfer(
+                            method,
+                            infd,
+                            outfd,
+                            current_bytes,
+                            min(block_bytes, end - current_bytes),
+                        )
+                    except OSError as e:
+                        if method == self.SENDFILE_METHOD:
+                            raise
+                        # not every pair of filesystems supports in-kernel copies
+                        logger.debug(e)
+                        sent_bytes = None
+
+                    # some filesystems silently refuse in-kernel copies too
+                    if not sent_bytes and method != self.SENDFILE_METHOD:
+                        method = self.SENDFILE_METHOD
+                        self._set_method(destination.name, method)
+                        continue
+
+                    # the source got shorter in the meantime
+                    if sent_bytes == 0:
+                        break
+
+                    # fsync frequency is indirectly controlled by the size of the block
+                    if self._durability == self.BLOCK_DURABILITY:
+                        os.fsync(outfd)
+
+                    if self._streaming:
+                        self._release(infd, outfd, current_bytes, sent_bytes)
+
+                    # now dynamically adjust the block size so that it
+                    # will keep fsync frequency between 750 and 1250ms
+                    now = time.monotonic()
+                    if now - last_sync > 1.25:
+                        block_bytes //= 2
+                    elif now - last_sync < 0.75:
+                        block_bytes *= 2
+
+                    # on 32 bit arch block size must be capped
+                    if arch_capped:
+                        block_bytes = min(block_bytes, 2**30)
+
+                    # some lower and upper bounds
+                    block_bytes = max(block_bytes, block_min_bytes)
+                    block_bytes = min(block_bytes, total_bytes)
+
+                    last_sync = now
+                    current_bytes += sent_bytes
+                    copied_bytes += sent_bytes
+
+                    self._advance(destination.name, sent_bytes)
+
+                    # only offsets that already made it to disk can be resumed
+                    if self._journal and self._durability == self.BLOCK_DURABILITY:
+                        self._journal.advance(destination.name, current_bytes, lstat)
+        except BaseException:
+            # a reserved file would look complete, with zeros at the end
+            if not sparse:
+                os.ftruncate(outfd, current_bytes)
+            raise
+
+        # trailing holes are not written at all
+        os.ftruncate(outfd, total_bytes)
+
+        # progress goes by logical size, holes included
+        self._advance(destination.name, max(total_bytes - copied_bytes, 0))
+
+        logger.debug(f"{method} block size converged to {block_bytes}")
+
+        if self._durability == self.FILE_DURABILITY:
             os.fsync(outfd)
 
-            # now dynamically adjust the block size so that it
-            # will keep fsync frequency between 750 and 1250ms
-            now = time.monotonic()
-            if now - last_sync > 1.25:
-                block_bytes //= 2
-            elif now - last_sync < 0.75:
-                block_bytes *= 2
+    def _hash(self, path, uncached=False):
+        digest = hashlib.blake2b()
 
-            # on 32 bit arch block size must be capped
-            if arch_capped:
-                block_bytes = min(block_bytes, 2**30)
+        with open(path, "rb") as file:
+            fd = file.fileno()
 
-            # some lower and upper bounds
-            block_bytes = max(block_bytes, block_min_bytes)
-            block_bytes = min(block_bytes, total_bytes)
+            # what was just written would otherwise be read back from memory
+            if uncached and hasattr(os, "posix_fadvise"):
+                os.fdatasync(fd)
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
 
-            last_sync = now
-            current_bytes += sent_bytes
-            self._report_status(destination.name, current_bytes, total_bytes)
+            while block := file.read(self.HASH_BLOCK):
+                self._stop_check()
+                digest.update(block)
 
-        logger.debug(f"sendfile block size converged to {block_bytes}")
+        return digest.digest()
 
-    def _copy(self, source_path, destination_path):
+    def _check(self, source_digest, destination_path):
+        if source_digest.result() != self._hash(destination_path, True):
+            logger.debug(f"{destination_path} does not match its source")
+            self.emit("mismatched", destination_path)
+
+    def _wait_verified(self):
+        for verification in self._verifications:
+            verification.result()
+
+    def _copy_file(self, source_path, destination_path):
         if os.path.islink(source_path):
+            if self._resume and os.path.lexists(destination_path):
+                os.unlink(destination_path)
             os.symlink(os.readlink(source_path), destination_path)
-            return
+            return False
+
+        lstat = os.stat(source_path)
+        offset = 0
+
+        if self._journal is not None:
+            if self._journal.is_completed(destination_path, lstat):
+                self._advance(destination_path, lstat.st_size)
+                return True
+            offset = self._journal.get_offset(destination_path, lstat)
+
+        # the source is hashed on the side while it is being copied
+        digest = None
+        if self._verifier is not None:
+            digest = self._verifier.submit(self._hash, source_path)
 
         with open(source_path, "rb") as source:
-            with open(destination_path, "wb") as destination:
-                self._do_copy(source, destination)
+            with open(destination_path, "r+b" if offset else "wb") as destination:
+                self._do_copy(source, destination, offset)
 
         shutil.copymode(source_path, destination_path)
 
+        # only files that already made it to disk can be skipped
+        if self._journal is not None and self._durability in [
+            self.BLOCK_DURABILITY,
+            self.FILE_DURABILITY,
+        ]:
+            self._journal.complete(destination_path, lstat)
+
+        if digest is not None:
+            verification = self._verifier.submit(self._check, digest, destination_path)
+            self._verifications.append(verification)
+
+        return True
+
+    def _wait_copy(self, pending):
+        future, destination_path = pending.popleft()
+
+        # links count as files too, even though nothing gets copied
+        future.result()
+
+        with self._lock:
+            self._method = self._methods.pop(destination_path, self._method)
+
         self._count += 1
-        self._copy_was_called = True
 
-    def run(self):
-        self._count = 0
-        self._total = sum([utils.count(path) for path, ref in self._selection])
+        self._report_status(destination_path)
 
-        self.emit("started", self._total)
+    def _put(self, item):
+        while True:
+            if self._done.is_set():
+                raise WorkerStoppedException()
+            try:
+                self._queue.put(item, timeout=0.1)
+            except queue.Full:
+                continue
+            return
+
+    def _found(self, path):
+        if self._done.is_set():
+            raise WorkerStoppedException()
+
+        lstat = os.lstat(path)
+        self._total += 1
+        self._total_bytes += lstat.st_size
+
+        # hard links only take space once
+        if lstat.st_nlink > 1:
+            inode = (lstat.st_dev, lstat.st_ino)
+            if inode in self._inodes:
+                return lstat
+            self._inodes.add(inode)
+
+        self._required += min(lstat.st_size, lstat.st_blocks * 512)
+
+        return lstat
+
+    def _walk(self, tops):
+        def _callback(error):
+            raise error
+
+        for index, (path, destination, overwritten) in enumerate(tops):
+            yield ("top", index)
+
+            if os.path.isdir(path) and (self.FOLLOW_LINKS or not os.path.islink(path)):
+                for directory, dirs, files in os.walk(
+                    path, followlinks=self.FOLLOW_LINKS, onerror=_callback
+                ):
+                    relative_path = os.path.relpath(directory, path)
+                    target = os.path.normpath(os.path.join(destination, relative_path))
+                    yield ("folder", directory, target)
+
+                    # links to folders that are not followed go as they are
+                    if not self.FOLLOW_LINKS:
+                        files += [
+                            name
+                            for name in dirs
+                            if os.path.islink(os.path.join(directory, name))
+                        ]
+
+                    for name in files:
+                        yield (
+                            "file",
+                            os.path.join(directory, name),
+                            os.path.join(target, name),
+                        )
+            else:
+                yield ("file", path, destination)
+
+            yield ("done", index)
+
+    def _discover(self, items, counting):
+        item = None
+
+        try:
+            for item in items:
+                # files carry what they looked like when found
+                if counting and item[0] == "file":
+                    item = (*item, self._found(item[1]))
+                # tops carry what was needed before them
+                elif counting and item[0] == "top":
+                    item = (*item, self._required)
+                self._put(item)
+            item = None
+        except WorkerStoppedException:
+            return
+        except Exception as e:
+            logger.debug(e)
+            item = ("error", e)
+        finally:
+            self._discovering = False
+
+        try:
+            self._put(item)
+        except WorkerStoppedException:
+            pass
+
+    def _reset_progress(self):
+        self._count = 0
+        self._total = 0
+        self._total_bytes = 0
+        self._done_bytes = 0
+        self._last_done_bytes = 0
+        self._last_report = time.monotonic()
+        self._rate = 0.0
+        self._required = 0
+        self._saved_bytes = 0
+        self._inodes = set()
+        self._links = {}
+
+    def _start_discovery(self, items, counting):
+        self._discovering = counting
+        self._queue = queue.Queue(maxsize=self.QUEUE_SIZE)
+
+        # totals keep growing while the selection is being copied
+        thread = threading.Thread(
+            target=self._discover, args=(items, counting), daemon=True
+        )
+        thread.start()
+
+    def _start(self):
+        # a plan was already walked, nothing to check again
+        if self._plan is not None:
+            self._total = self._plan.total
+            self._total_bytes = self._plan.total_bytes
+            self._required = self._plan.required_bytes
+            self._available = self._plan.available_bytes
+            # but never start what can't fit
+            self._check_space()
+            self._start_discovery(self._plan.items, False)
+            return self._plan.renames, self._plan.tops
+
+        renames, tops, skipped = self._get_tops()
+        self._total = len(renames)
+        self._available = self._get_available_bytes()
+        self._start_discovery(self._walk(tops), True)
+
+        return renames, tops
+
+    def _get_tops(self):
+        tops = []
 
         for path, ref in self._selection:
             name = os.path.basename(path)
@@ -171,88 +740,363 @@ class PortfolioCopyWorker(PortfolioWorker):
             overwritten = os.path.lexists(destination)
 
             if path == destination:
-                name = utils.find_new_name(self._directory, name)
-                destination = os.path.join(self._directory, name)
+                # a resumed duplicate goes on with the copy it started
+                resumed = self._journal and self._journal.get_destination(path)
+                if resumed:
+                    destination = resumed
+                else:
+                    name = utils.find_new_name(self._directory, name)
+                    destination = os.path.join(self._directory, name)
                 overwritten = False
 
+            tops.append((path, destination, overwritten))
+
+        return [], tops, 0
+
+    def _prepare(self, path, destination, overwritten):
+        # resumed copies continue from whatever is there
+        if overwritten and os.path.isdir(path) and not self._resume:
+            shutil.rmtree(destination)
+
+    def _finish(self, directories):
+        for directory, target in reversed(directories):
+            shutil.copystat(directory, target)
+
+    def _post_update(self, path, destination, overwritten):
+        self._sync_folder(os.path.dirname(destination))
+        default_listings.invalidate(self._directory)
+        info = utils.get_file_info(destination)
+        self.emit(
+            "post-update",
+            os.path.basename(destination),
+            destination,
+            default_icons.get_icon(destination, info),
+            overwritten,
+        )
+
+    def _open_journal(self):
+        if not self.JOURNALED:
+            return
+
+        paths = [path for path, ref in self._selection]
+        self._journal = PortfolioJournal(paths, self._directory)
+
+        try:
+            self._journal.open(self._resume)
+        except OSError as e:
+            logger.debug(e)
+            self._journal = None
+
+    def _close_journal(self):
+        if self._journal is not None:
+            self._journal.close()
+
+    def _rename(self, path, destination, overwritten):
+        self._failed = destination
+        self._prepare(path, destination, overwritten)
+        os.rename(path, destination)
+
+        self._count += 1
+        self._report_status(destination, force=True)
+        self._post_update(path, destination, overwritten)
+
+    def _link_file(self, future, target_path, source_path, destination_path, lstat):
+        # the first copy has to be there to link to
+        future.result()
+
+        # links can't be written over like copies are
+        if os.path.lexists(destination_path):
+            os.unlink(destination_path)
+        os.link(target_path, destination_path)
+
+        with self._lock:
+            self._saved_bytes += lstat.st_size
+
+        self._advance(destination_path, lstat.st_size)
+
+        return True
+
+    def _submit(self, executor, source_path, destination_path, lstat):
+        if not stat.S_ISREG(lstat.st_mode):
+            return executor.submit(self._copy_file, source_path, destination_path)
+
+        # hard links are copied once and linked everywhere else, even
+        # when cutting already took the other links away from the source
+        inode = (lstat.st_dev, lstat.st_ino)
+        if inode in self._links:
+            future, target_path = self._links[inode]
+            return executor.submit(
+                self._link_file,
+                future,
+                target_path,
+                source_path,
+                destination_path,
+                lstat,
+            )
+
+        future = executor.submit(self._copy_file, source_path, destination_path)
+        if lstat.st_nlink > 1:
+            self._links[inode] = (future, destination_path)
+
+        return future
+
+    def _copy_all(self, tops):
+        directories = []
+        pending = deque()
+
+        # directories are created in order, files are copied concurrently
+        with ThreadPoolExecutor(max_workers=self.WORKERS) as executor:
             try:
+                for item in iter(self._queue.get, None):
+                    self._stop_check()
+
+                    kind = item[0]
+                    if kind == "error":
+                        raise item[1]
+                    elif kind == "top":
+                        path, destination, overwritten = tops[item[1]]
+                        self._failed = destination
+                        if overwritten and not self._resume and self._plan is None:
+                            self._make_room(path, destination, item[2])
+                        self._prepare(path, destination, overwritten)
+                    elif kind == "folder":
+                        os.makedirs(item[2], exist_ok=self._resume)
+                        directories.append(item[1:])
+                    elif kind == "file":
+                        self._check_space()
+                        future = self._submit(executor, *item[1:])
+                        pending.append((future, item[2]))
+
+                        # progress is reported in the same order files were found
+                        while len(pending) > self.WORKERS * 2:
+                            self._wait_copy(pending)
+                    elif kind == "done":
+                        while pending:
+                            self._wait_copy(pending)
+                        self._finish(directories)
+                        directories = []
+
+                        path, destination, overwritten = tops[item[1]]
+                        self._report_status(destination, force=True)
+                        self._post_update(path, destination, overwritten)
+            except Exception:
+                # copies already running would otherwise carry on to the end
+                self._cancellable.cancel()
+                executor.shutdown(cancel_futures=True)
+                raise
+
+    def run(self):
+        self._reset_progress()
+        self._failed = self._directory
+
+        self.emit("started", len(self._selection))
+
+        if self._verify:
+            self._verifier = ThreadPoolExecutor(max_workers=1)
+
+        try:
+            self._open_journal()
+            renames, tops = self._start()
+
+            # so resuming knows where duplicates were going
+            if self._journal is not None:
+                for path, destination, overwritten in tops:
+                    self._journal.choose(path, destination)
+
+            # no need to walk what can just be renamed
+            for path, destination, overwritten in renames:
                 self._stop_check()
+                self._rename(path, destination, overwritten)
 
-                if os.path.isdir(path):
-                    if overwritten and os.path.isdir(path):
-                        shutil.rmtree(destination)
-                    shutil.copytree(path, destination, copy_function=self._copy)
-                else:
-                    self._copy(path, destination)
-            except WorkerStoppedException:
-                self.emit("stopped")
-                return
-            except Exception as e:
-                logger.debug(e)
-                self.emit("failed", destination)
-                return
-            else:
-                utils.sync_folder(os.path.dirname(destination))
-                self.emit(
-                    "post-update",
-                    os.path.basename(destination),
-                    destination,
-                    utils.get_file_icon(destination),
-                    overwritten,
-                )
+            # anything else goes file by file
+            self._copy_all(tops)
+            self._wait_verified()
+        except WorkerStoppedException:
+            self.emit("stopped")
+            return
+        except Exception as e:
+            logger.debug(e)
+            self.emit("failed", self._failed)
+            return
+        finally:
+            self._done.set()
+            self._close_journal()
+            if self._verifier is not None:
+                self._verifier.shutdown(cancel_futures=True)
+
+        try:
+            self._sync_filesystem()
+        except Exception as e:
+            logger.debug(e)
+            self.emit("failed", self._directory)
+            return
+
+        # nothing left to resume
+        if self._journal is not None:
+            self._journal.remove()
 
         self.emit("finished", self._total)
 
+    def plan(self):
+        renames, tops, skipped = self._get_tops()
+
+        self._reset_progress()
+        self._total = len(renames)
+        overwritten = len([top for top in renames if top[2]])
+        removed = set()
+        freed = 0
+        items = []
+
+        # whatever is already there gives its space back
+        for path, destination, existed in renames + tops:
+            if not existed:
+                continue
+
+            tree = list(self._get_tree(destination))
+            freed += self._get_allocated_bytes(tree)
+
+            # overwritten folders are removed before anything is pasted
+            if os.path.isdir(path):
+                removed.update(tree)
+
+        for item in self._walk(tops):
+            self._stop_check()
+
+            if item[0] == "top":
+                item = (*item, self._required)
+            elif item[0] == "file":
+                item = (*item, self._found(item[1]))
+                if os.path.lexists(item[2]):
+                    overwritten += 1
+                    removed.discard(item[2])
+
+            items.append(item)
+
+        return PastePlan(
+            renames,
+            tops,
+            items,
+            self._total,
+            overwritten,
+            len(removed),
+            skipped,
+            self._total_bytes,
+            max(self._required - freed, 0),
+            self._get_available_bytes(),
+        )
+
 
 class PortfolioCutWorker(PortfolioCopyWorker):
     __gtype_name__ = "PortfolioCutWorker"
 
-    def run(self):
-        self._count = 0
-        self._total = sum([utils.count(path) for path, ref in self._selection])
+    FOLLOW_LINKS = False
+    JOURNALED = False
+    VERIFIED = False
+
+    def _is_local(self, path):
+        if os.lstat(path).st_dev != os.stat(self._directory).st_dev:
+            return False
+
+        # bind mounts share devices but can't rename across
+        mount_point = utils.find_mount_point(os.path.dirname(path))
+        return mount_point == utils.find_mount_point(self._directory)
+
+    def _copy_file(self, source_path, destination_path):
+        try:
+            copied = super()._copy_file(source_path, destination_path)
+
+            # the source can only go once its copy is on disk
+            if copied and self._durability not in [
+                self.BLOCK_DURABILITY,
+                self.FILE_DURABILITY,
+            ]:
+                with open(destination_path, "rb") as destination:
+                    os.fsync(destination.fileno())
+        except BaseException:
+            # a file is either here or there, never half way
+            if os.path.lexists(destination_path):
+                os.unlink(destination_path)
+            raise
+
+        os.unlink(source_path)
+
+        return copied
+
+    def _link_file(self, future, target_path, source_path, destination_path, lstat):
+        linked = super()._link_file(
+            future, target_path, source_path, destination_path, lstat
+        )
+        os.unlink(source_path)
+
+        return linked
 
-        self.emit("started", self._total)
+    def _prepare(self, path, destination, overwritten):
+        super()._prepare(path, destination, overwritten)
+
+        if overwritten and os.path.islink(destination):
+            os.unlink(destination)
+
+    def _finish(self, directories):
+        super()._finish(directories)
+
+        for directory, target in reversed(directories):
+            os.rmdir(directory)
+
+    def _post_update(self, path, destination, overwritten):
+        default_listings.invalidate(os.path.dirname(path))
+        super()._post_update(path, destination, overwritten)
+
+    def _get_tops(self):
+        renames = []
+        tops = []
+        skipped = 0
 
         for path, ref in self._selection:
-            name = os.path.basename(path)
-            destination = os.path.join(self._directory, name)
+            destination = os.path.join(self._directory, os.path.basename(path))
             overwritten = os.path.lexists(destination)
 
-            try:
-                self._stop_check()
-
-                if destination == path:
-                    continue
-                if overwritten and os.path.isdir(path):
-                    shutil.rmtree(destination)
-                if overwritten and os.path.islink(destination):
-                    os.unlink(destination)
-                shutil.move(path, destination, copy_function=self._copy)
-            except WorkerStoppedException:
-                self.emit("stopped")
-                return
-            except Exception as e:
-                logger.debug(e)
-                self.emit("failed", path)
-                return
+            if destination == path:
+                skipped += 1
+            elif self._is_local(path):
+                renames.append((path, destination, overwritten))
             else:
-                utils.sync_folder(os.path.dirname(destination))
-
-                # XXX force report even if count is not precise
-                if self._copy_was_called is False:
-                    self._count += 1
-                    total_bytes = os.lstat(destination).st_size
-                    self._report_status(destination, total_bytes, total_bytes)
-
-                self.emit(
-                    "post-update",
-                    os.path.basename(destination),
-                    destination,
-                    utils.get_file_icon(destination),
-                    overwritten,
-                )
+                tops.append((path, destination, overwritten))
+
+        return renames, tops, skipped
 
-        self.emit("finished", self._total)
+
+class PortfolioPlanWorker(PortfolioWorker):
+    __gtype_name__ = "PortfolioPlanWorker"
+
+    __gsignals__ = {
+        "started": (GObject.SignalFlags.RUN_LAST, None, ()),
+        "finished": (GObject.SignalFlags.RUN_LAST, None, (object,)),
+        "failed": (GObject.SignalFlags.RUN_LAST, None, (str,)),
+        "stopped": (GObject.SignalFlags.RUN_LAST, None, ()),
+    }
+
+    def __init__(self, Worker, selection, directory):
+        super().__init__()
+        self._worker = Worker(selection, directory)
+        self._directory = directory
+
+    def stop(self):
+        self._worker.stop()
+
+    def run(self):
+        self.emit("started")
+
+        try:
+            plan = self._worker.plan()
+        except WorkerStoppedException:
+            self.emit("stopped")
+            return
+        except Exception as e:
+            logger.debug(e)
+            self.emit("failed", self._directory)
+            return
+
+        self.emit("finished", plan)
 
 
 class PortfolioDeleteWorker(GObject.GObject, CachedWorker):
@@ -307,6 +1151,7 @@ class PortfolioDeleteWorker(GObject.GObject, CachedWorker):
                 os.rmdir(path)
             else:
                 os.unlink(path)
+            default_listings.invalidate(os.path.dirname(path))
         except Exception as e:
             logger.debug(e)
             self.emit("failed", path)
@@ -325,7 +1170,7 @@ class PortfolioDeleteWorker(GObject.GObject, CachedWorker):
         self.emit("stopped")
 
 
-class PortfolioLoadWorker(GObject.GObject, CachedWorker):
+class PortfolioLoadWorker(PortfolioWorker, CachedWorker):
     __gtype_name__ = "PortfolioLoadWorker"
 
     __gsignals__ = {
@@ -336,55 +1181,114 @@ class PortfolioLoadWorker(GObject.GObject, CachedWorker):
     }
 
     BUFFER = 75
+    BUFFER_MIN = 10
+    BUFFER_MAX = 5000
+    BUDGET = 8
+    FLUSH_INTERVAL = 0.1
+    LAZY_THRESHOLD = 1000
 
-    def __init__(self, directory, hidden=False):
+    def __init__(self, directory, budget=BUDGET):
         super().__init__()
         CachedWorker.__init__(self)
         self._directory = directory
-        self._hidden = hidden
-        self._timeout_handler_id = None
+        self._budget = budget / 1000
+        self._buffer = self.BUFFER
+
+        # don't let a slow mount keep the application from quitting
+        self.daemon = True
+
+    def _adjust(self, count, elapsed):
+        # size the next batches so that handling them fits within the budget
+        if elapsed > 0:
+            buffer = int(count * self._budget / elapsed)
+        else:
+            buffer = self.BUFFER_MAX
+
+        self._buffer = max(self.BUFFER_MIN, min(buffer, self.BUFFER_MAX))
+
+    def _emit(self, *args):
+        # a stopped loader is being replaced, drop whatever it left queued
+        if self._cancellable.is_cancelled():
+            return GLib.SOURCE_REMOVE
+
+        start = time.monotonic()
+        GObject.GObject.emit(self, *args)
+
+        if args[0] == "updated":
+            self._adjust(len(args[2]), time.monotonic() - start)
+
+        return GLib.SOURCE_REMOVE
+
+    def emit(self, *args):
+        GLib.idle_add(self._emit, *args, priority=GLib.PRIORITY_HIGH_IDLE + 20)
 
     def start(self):
-        self.emit("started", self._directory)
+        GObject.GObject.emit(self, "started", self._directory)
+        super().start()
 
+    def _replay(self, listing):
+        total = len(listing)
+        index = 0
+
+        while index < total:
+            if self._cancellable.is_cancelled():
+                return
+
+            found = listing[index : index + self._buffer]
+            index += len(found)
+            self.emit("updated", self._directory, found, index, total)
+
+        self.emit("finished", self._directory)
+
+    def run(self):
         try:
-            self._paths = os.listdir(self._directory)
+            stamp = default_listings.get_stamp(self._directory)
+            listing = default_listings.retrieve(self._directory, stamp)
+            if listing is not None:
+                self._replay(listing)
+                return
+
+            with os.scandir(self._directory) as scanner:
+                entries = list(scanner)
         except Exception as e:
             logger.debug(e)
             self.emit("failed", self._directory)
             return
 
-        self._total = len(self._paths)
-        self._index = 0
-        self._timeout_handler_id = GLib.idle_add(
-            self.step, priority=GLib.PRIORITY_HIGH_IDLE + 20
-        )
+        total = len(entries)
+        found = []
+        listing = []
+        last_flush = time.monotonic()
 
-    def step(self):
-        if self._index >= self._total:
-            self.emit("finished", self._directory)
-            return
+        # on large directories leave icons to be resolved on demand
+        lazy = total > self.LAZY_THRESHOLD
 
-        found = []
-        for index in range(0, self.BUFFER):
-            if self._index + index < self._total:
-                name = self._paths[self._index + index]
-                if not self._hidden and name.startswith("."):
-                    continue
-                path = os.path.join(self._directory, name)
-                found.append((name, path, utils.get_file_icon(path)))
+        for index, entry in enumerate(entries, 1):
+            if self._cancellable.is_cancelled():
+                return
+            try:
+                info = utils.get_entry_info(entry, lazy)
+                icon = None if lazy else default_icons.get_icon(entry.path, info)
+            except Exception as e:
+                # it could be gone by now
+                logger.debug(e)
+                continue
 
-        self._index += self.BUFFER
-        self.emit("updated", self._directory, found, self._index, self._total)
-        self._timeout_handler_id = GLib.idle_add(
-            self.step, priority=GLib.PRIORITY_HIGH_IDLE + 20
-        )
+            found.append((entry.name, entry.path, icon, info))
+            listing.append(found[-1])
 
-    def stop(self):
-        if self._timeout_handler_id is None:
-            return
-        GLib.Source.remove(self._timeout_handler_id)
-        self._timeout_handler_id = None
+            # slow mounts still get to report progress regularly
+            now = time.monotonic()
+            if len(found) >= self._buffer or now - last_flush > self.FLUSH_INTERVAL:
+                self.emit("updated", self._directory, found, index, total)
+                found = []
+                last_flush = now
+
+        if found:
+            self.emit("updated", self._directory, found, total, total)
+
+        default_listings.store(self._directory, stamp, listing)
+        self.emit("finished", self._directory)
 
 
 class PortfolioOpenWorker(GObject.GObject):
@@ -667,6 +1571,7 @@ class PortfolioSendTrashWorker(GObject.GObject, CachedWorker):
         try:
             self.emit("pre-update", path)
             default_trash.trash(path)
+            default_listings.invalidate(os.path.dirname(path))
         except Exception as e:
             logger.debug(e)
             self.emit("failed", path)
@@ -723,7 +1628,8 @@ class PortfolioRestoreTrashWorker(GObject.GObject, CachedWorker):
 
         try:
             self.emit("pre-update", path)
-            default_trash.restore(path)
+            orig_path = default_trash.restore(path)
+            default_listings.invalidate(os.path.dirname(orig_path))
         except Exception as e:
             logger.debug(e)
             self.emit("failed", path)
@@ -808,7 +1714,7 @@ class PortfolioLoadTrashWorker(GObject.GObject, CachedWorker):
         "failed": (GObject.SignalFlags.RUN_LAST, None, (str,)),
     }
 
-    def __init__(self, directory=None, hidden=False):
+    def __init__(self, directory=None, budget=None):
         super().__init__()
         CachedWorker.__init__(self)
         self._timeout_handler_id = None
@@ -836,10 +1742,11 @@ class PortfolioLoadTrashWorker(GObject.GObject, CachedWorker):
 
         path = self._paths[self._index]
         name = os.path.basename(path)
-        icon = utils.get_file_icon(path)
+        info = utils.get_file_info(path)
+        icon = default_icons.get_icon(path, info)
 
         self._index += 1
-        self.emit("updated", "", [(name, path, icon)], self._index, self._total)
+        self.emit("updated", "", [(name, path, icon, info)], self._index, self._total)
         self._timeout_handler_id = GLib.idle_add(
             self.step, priority=GLib.PRIORITY_HIGH_IDLE + 20
         )